@@ -3,6 +3,7 @@ import streamlit as st
 import list_files
 import login
 import upload_form
+from profiling import PROFILING_ENABLED, profile
 
 # Initialize the session state variable at the very beginning.
 if "authenticated" not in st.session_state:
@@ -22,5 +23,9 @@ if not st.session_state.authenticated:
 else:
     page = PAGES["Upload Form"]
 
-with st.spinner(f"Loading  ..."):
+with st.spinner(f"Loading  ..."), profile("rerun"):
     page.run()
+
+# Rendered outside the rerun profile so loading profiles doesn't show up as a hotspot
+if PROFILING_ENABLED and page is upload_form:
+    upload_form.render_profile_summary()
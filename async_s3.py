@@ -0,0 +1,267 @@
+import asyncio
+import atexit
+import os
+import threading
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+from botocore.exceptions import ClientError
+from decouple import config
+
+# Maximum number of S3 requests in flight across all active cases. Each download
+# holds a socket and a local file open, so keep this well under `ulimit -n` / 2
+S3_MAX_CONCURRENCY = config("S3_MAX_CONCURRENCY", default=256, cast=int)
+# Part size for multipart uploads (S3 requires at least 5 MiB per part)
+S3_MULTIPART_CHUNK_SIZE = config(
+    "S3_MULTIPART_CHUNK_SIZE", default=8 * 1024 * 1024, cast=int
+)
+# Maximum number of upload parts held in memory at the same time
+S3_MAX_BUFFERED_PARTS = config("S3_MAX_BUFFERED_PARTS", default=16, cast=int)
+S3_READ_CHUNK_SIZE = 1024 * 1024
+
+AWS_S3_ENDPOINT_URL = config("AWS_S3_ENDPOINT_URL", default="") or None
+
+
+def read_chunk(path, offset, size):
+    """
+    Reads a block of bytes from a local file.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+async def notify(callback, *args):
+    """
+    Runs a progress callback in a worker thread so it cannot stall the event loop.
+    """
+    if callback:
+        await asyncio.to_thread(callback, *args)
+
+
+class AsyncS3Engine:
+    """
+    Drives all S3 listing, downloads and uploads on a single asyncio event loop
+    running in a background thread. The public methods are blocking and can be
+    called from any thread (Streamlit reruns, per-case workers).
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="async-s3-engine", daemon=True
+        )
+        self._thread.start()
+        try:
+            self._client = self._run(self._create_client())
+        except Exception:
+            # Don't leave the loop thread running when the client can't be created
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            raise
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _create_client(self):
+        self._requests = asyncio.Semaphore(S3_MAX_CONCURRENCY)
+        self._buffered_parts = asyncio.Semaphore(S3_MAX_BUFFERED_PARTS)
+        self._client_context = get_session().create_client(
+            "s3",
+            aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
+            region_name=config("AWS_REGION"),
+            endpoint_url=AWS_S3_ENDPOINT_URL,
+            config=AioConfig(max_pool_connections=S3_MAX_CONCURRENCY),
+        )
+        return await self._client_context.__aenter__()
+
+    async def _list_objects(self, bucket_name, prefix):
+        paginator = self._client.get_paginator("list_objects_v2")
+        objects = []
+        async for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+    async def _download_file(self, bucket_name, file_key, download_dir, on_file):
+        temp_file_path = os.path.join(download_dir, os.path.basename(file_key))
+        async with self._requests:
+            response = await self._client.get_object(Bucket=bucket_name, Key=file_key)
+            stream = response["Body"]
+            async with stream:
+                # Write to a side file so a crash never leaves a truncated member.
+                # Disk I/O runs in worker threads to keep the event loop free.
+                f = await asyncio.to_thread(open, f"{temp_file_path}.part", "wb")
+                try:
+                    while chunk := await stream.read(S3_READ_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, f"{temp_file_path}.part", temp_file_path)
+        await notify(on_file, file_key)
+        return temp_file_path
+
+    async def _download_files(self, bucket_name, file_keys, download_dir, on_file):
+        results = await asyncio.gather(
+            *(
+                self._download_file(bucket_name, file_key, download_dir, on_file)
+                for file_key in file_keys
+            ),
+            return_exceptions=True,
+        )
+
+        downloaded_files = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Error downloading file: {result}")
+            else:
+                downloaded_files.append(result)
+        return downloaded_files
+
+    async def _upload_part(
+        self, bucket_name, key, upload_id, part_number, path, offset, part_size
+    ):
+        async with self._buffered_parts:
+            data = await asyncio.to_thread(read_chunk, path, offset, part_size)
+            async with self._requests:
+                response = await self._client.upload_part(
+                    Bucket=bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=data,
+                )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    async def _multipart_upload(
+        self, path, bucket_name, key, size, checkpoint, on_checkpoint
+    ):
+        if not checkpoint.get("upload_id"):
+            upload = await self._client.create_multipart_upload(
+                Bucket=bucket_name, Key=key
+            )
+            event = {
+                "upload_id": upload["UploadId"],
+                "part_size": S3_MULTIPART_CHUNK_SIZE,
+                "parts": [],
+            }
+            checkpoint.update(event)
+            await notify(on_checkpoint, event)
+
+        upload_id = checkpoint["upload_id"]
+        part_size = checkpoint["part_size"]
+        completed = {part["PartNumber"] for part in checkpoint["parts"]}
+
+        async def upload_part(part_number, offset):
+            part = await self._upload_part(
+                bucket_name, key, upload_id, part_number, path, offset, part_size
+            )
+            checkpoint["parts"].append(part)
+            await notify(on_checkpoint, {"part": part})
+
+        results = await asyncio.gather(
+            *(
+                upload_part(part_number, offset)
+                for part_number, offset in enumerate(range(0, size, part_size), 1)
+                if part_number not in completed
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        await self._client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": sorted(checkpoint["parts"], key=lambda p: p["PartNumber"])
+            },
+        )
+
+    async def _upload_file(self, path, bucket_name, key, checkpoint, on_checkpoint):
+        size = os.path.getsize(path)
+
+        if size <= S3_MULTIPART_CHUNK_SIZE:
+            data = await asyncio.to_thread(read_chunk, path, 0, size)
+            async with self._requests:
+                await self._client.put_object(Bucket=bucket_name, Key=key, Body=data)
+            return
+
+        if checkpoint is None:
+            checkpoint = {"upload_id": None, "part_size": None, "parts": []}
+            try:
+                await self._multipart_upload(
+                    path, bucket_name, key, size, checkpoint, on_checkpoint
+                )
+            except Exception:
+                if checkpoint["upload_id"]:
+                    await self._client.abort_multipart_upload(
+                        Bucket=bucket_name, Key=key, UploadId=checkpoint["upload_id"]
+                    )
+                raise
+            return
+
+        # Checkpointed uploads are left open on failure so a retry can resume them
+        try:
+            await self._multipart_upload(
+                path, bucket_name, key, size, checkpoint, on_checkpoint
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "NoSuchUpload":
+                raise
+            # The upload expired or was aborted meanwhile: start it over
+            checkpoint["upload_id"] = None
+            await self._multipart_upload(
+                path, bucket_name, key, size, checkpoint, on_checkpoint
+            )
+
+    def list_objects(self, bucket_name, prefix):
+        """
+        Lists every object under a prefix, following pagination.
+        """
+        return self._run(self._list_objects(bucket_name, prefix))
+
+    def download_files(self, bucket_name, file_keys, download_dir, on_file=None):
+        """
+        Downloads files concurrently and returns the local paths of the ones that succeeded.
+        on_file(file_key) is called in a worker thread as each file lands on disk.
+        """
+        return self._run(
+            self._download_files(bucket_name, file_keys, download_dir, on_file)
+        )
+
+    def upload_file(self, path, bucket_name, key, checkpoint=None, on_checkpoint=None):
+        """
+        Uploads a local file, using a parallel multipart upload for large files.
+        With a checkpoint dict ({"upload_id", "part_size", "parts"}), the upload
+        resumes from the parts recorded there. on_checkpoint(event) is called in a
+        worker thread with each change: {"upload_id", "part_size", "parts"} when an
+        upload starts and {"part": {...}} for every completed part.
+        """
+        return self._run(
+            self._upload_file(path, bucket_name, key, checkpoint, on_checkpoint)
+        )
+
+    def close(self):
+        self._run(self._client_context.__aexit__(None, None, None))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Returns the process-wide S3 engine, starting its event loop on first use.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncS3Engine()
+            atexit.register(_engine.close)
+    return _engine
@@ -0,0 +1,175 @@
+"""
+Benchmark of the asyncio S3 engine against the thread-pool transfer path.
+
+Run it against a local S3 stand-in (moto_server, MinIO, ...) by pointing
+AWS_S3_ENDPOINT_URL at it, e.g.:
+
+    moto_server -p 5000 &
+    AWS_S3_ENDPOINT_URL=http://localhost:5000 python benchmark_s3_transfer.py --cases 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from decouple import config
+
+from async_s3 import AWS_S3_ENDPOINT_URL, get_engine
+from generate_pre_signed_url import AWS_S3_BUCKET_NAME, create_s3_client
+
+
+def download_file(s3_client, bucket_name, file_key, download_dir):
+    """
+    Downloads a single file from S3 to the specified directory.
+    """
+    temp_file_path = os.path.join(download_dir, os.path.basename(file_key))
+    s3_client.download_file(bucket_name, file_key, temp_file_path)
+    return temp_file_path
+
+
+def seed_bucket(s3_client, args):
+    """
+    Uploads the benchmark objects for every simulated case.
+    """
+    region = config("AWS_REGION")
+    bucket_config = (
+        {"CreateBucketConfiguration": {"LocationConstraint": region}}
+        if region != "us-east-1"
+        else {}
+    )
+    try:
+        s3_client.create_bucket(Bucket=AWS_S3_BUCKET_NAME, **bucket_config)
+    except s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+    payload = os.urandom(args.object_kb * 1024)
+    keys = [
+        f"{args.prefix}/case_{case}/file_{index:05d}.bin"
+        for case in range(args.cases)
+        for index in range(args.objects)
+    ]
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(
+            executor.map(
+                lambda key: s3_client.put_object(
+                    Bucket=AWS_S3_BUCKET_NAME, Key=key, Body=payload
+                ),
+                keys,
+            )
+        )
+
+
+def run_case_with_threads(s3_client, args, case):
+    """
+    Thread-pool path: list, download with 10 workers, then upload the archive.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        objects = s3_client.list_objects_v2(
+            Bucket=AWS_S3_BUCKET_NAME, Prefix=f"{args.prefix}/case_{case}/"
+        )
+        file_keys = [obj["Key"] for obj in objects.get("Contents", [])]
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [
+                executor.submit(
+                    download_file, s3_client, AWS_S3_BUCKET_NAME, file_key, temp_dir
+                )
+                for file_key in file_keys
+            ]
+            for future in as_completed(futures):
+                future.result()
+
+        archive_path = write_archive(temp_dir, args)
+        s3_client.upload_file(
+            archive_path, AWS_S3_BUCKET_NAME, f"{args.prefix}/zips/threads_{case}.bin"
+        )
+        return len(file_keys)
+
+
+def run_case_with_engine(s3_engine, args, case):
+    """
+    Asyncio path: the same stages driven by the shared event loop.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        objects = s3_engine.list_objects(
+            AWS_S3_BUCKET_NAME, f"{args.prefix}/case_{case}/"
+        )
+        file_keys = [obj["Key"] for obj in objects]
+        s3_engine.download_files(AWS_S3_BUCKET_NAME, file_keys, temp_dir)
+
+        archive_path = write_archive(temp_dir, args)
+        s3_engine.upload_file(
+            archive_path, AWS_S3_BUCKET_NAME, f"{args.prefix}/zips/asyncio_{case}.bin"
+        )
+        return len(file_keys)
+
+
+def write_archive(temp_dir, args):
+    """
+    Writes a stand-in archive so both paths upload the same number of bytes.
+    """
+    archive_path = os.path.join(temp_dir, "archive.bin")
+    with open(archive_path, "wb") as f:
+        for _ in range(args.archive_mb):
+            f.write(os.urandom(1024 * 1024))
+    return archive_path
+
+
+def measure(name, run_case, args):
+    """
+    Runs every case in its own thread, as upload_form does, and reports timings.
+    """
+    peak_threads = threading.active_count()
+    case_times = []
+
+    def timed_case(case):
+        started = time.perf_counter()
+        files = run_case(case)
+        case_times.append(time.perf_counter() - started)
+        return files
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.cases) as executor:
+        futures = [executor.submit(timed_case, case) for case in range(args.cases)]
+        while not all(future.done() for future in futures):
+            peak_threads = max(peak_threads, threading.active_count())
+            time.sleep(0.01)
+        total_files = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<8} total {elapsed:8.2f}s | "
+        f"case median {statistics.median(case_times):7.2f}s | "
+        f"{total_files / elapsed:8.1f} files/s | "
+        f"peak threads {peak_threads}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=5, help="concurrent cases")
+    parser.add_argument("--objects", type=int, default=200, help="objects per case")
+    parser.add_argument("--object-kb", type=int, default=256, help="object size")
+    parser.add_argument("--archive-mb", type=int, default=64, help="archive size")
+    parser.add_argument("--prefix", default="benchmark", help="key prefix")
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    if not AWS_S3_ENDPOINT_URL:
+        parser.error("AWS_S3_ENDPOINT_URL must point to a local S3 stand-in")
+
+    s3_client = create_s3_client()
+    if not args.skip_seed:
+        seed_bucket(s3_client, args)
+
+    s3_engine = get_engine()
+    measure("threads", lambda case: run_case_with_threads(s3_client, args, case), args)
+    measure("asyncio", lambda case: run_case_with_engine(s3_engine, args, case), args)
+
+
+if __name__ == "__main__":
+    main()
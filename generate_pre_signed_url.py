@@ -1,101 +1,335 @@
 import os
-import tempfile
+import threading
+import time
 import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 import boto3
 from decouple import config
 
+from async_s3 import AWS_S3_ENDPOINT_URL, get_engine
+from upload_journal import UploadJournal, active_upload_ids, list_journals
+
 AWS_S3_BUCKET_NAME = config("AWS_S3_BUCKET_NAME")
+# Maximum size of the files in one ZIP volume, in bytes (0 = single ZIP)
+ZIP_VOLUME_MAX_BYTES = config("ZIP_VOLUME_MAX_BYTES", default=0, cast=int)
+# Number of ZIP volumes built at the same time
+ZIP_VOLUME_WORKERS = config("ZIP_VOLUME_WORKERS", default=4, cast=int)
+# Journals and multipart uploads older than this many hours are abandoned: the
+# janitor aborts the uploads and deletes the journals. Keep it at most 24, as the
+# lifecycle rule expires finished ZIPs after one day.
+ZIP_ORPHAN_UPLOAD_HOURS = config("ZIP_ORPHAN_UPLOAD_HOURS", default=24, cast=int)
+# Minutes between janitor passes
+ZIP_JANITOR_INTERVAL_MINUTES = config(
+    "ZIP_JANITOR_INTERVAL_MINUTES", default=60, cast=int
+)
+
+_case_locks = {}
+_case_locks_lock = threading.Lock()
+_janitor_started = False
+_janitor_lock = threading.Lock()
+
 
+def get_case_lock(case_id):
+    with _case_locks_lock:
+        return _case_locks.setdefault(case_id, threading.Lock())
 
-def download_file(s3_client, bucket_name, file_key, download_dir):
+
+def plan_volumes(objects, max_volume_bytes):
     """
-    Downloads a single file from S3 to the specified directory.
+    Groups S3 objects into volumes of whole files, each at most max_volume_bytes
+    (a single file larger than the cap gets a volume of its own). A cap of 0
+    keeps every file in one volume.
     """
-    temp_file_path = os.path.join(download_dir, os.path.basename(file_key))
-    s3_client.download_file(bucket_name, file_key, temp_file_path)
-    return temp_file_path
+    volumes = []
+    current, current_bytes = [], 0
+    for obj in objects:
+        if (
+            max_volume_bytes
+            and current
+            and current_bytes + obj["Size"] > max_volume_bytes
+        ):
+            volumes.append(current)
+            current, current_bytes = [], 0
+        current.append(obj["Key"])
+        current_bytes += obj["Size"]
+    if current:
+        volumes.append(current)
+    return volumes
 
 
-def zip_s3_bucket_contents(case_id):
+def create_s3_client():
+    return boto3.client(
+        "s3",
+        aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
+        region_name=config("AWS_REGION"),
+        endpoint_url=AWS_S3_ENDPOINT_URL,
+    )
+
+
+def discard_journal(s3_client, journal):
     """
-    Zips all files in an S3 bucket folder documents/downloads/{case_id} and returns a pre-signed URL for download
+    Aborts the journal's unfinished multipart uploads and deletes it with its staged files.
     """
-    try:
-        s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
-            region_name=config("AWS_REGION"),
+    for volume in journal.state.get("volumes", []):
+        if volume.get("upload_id") and not volume.get("uploaded"):
+            try:
+                s3_client.abort_multipart_upload(
+                    Bucket=AWS_S3_BUCKET_NAME,
+                    Key=volume["zip_key"],
+                    UploadId=volume["upload_id"],
+                )
+            except Exception as e:
+                print(f"Error aborting upload {volume['zip_key']}: {e}")
+    journal.discard()
+
+
+def discard_stale_journals(s3_client):
+    """
+    Discards journals older than ZIP_ORPHAN_UPLOAD_HOURS whose case is not running.
+    """
+    for journal in list_journals():
+        case_lock = get_case_lock(
+            journal.state.get("case_id", journal.journal_id[len("case_") :])
         )
+        if not case_lock.acquire(blocking=False):
+            continue
+        try:
+            # Reload under the case lock in case a retry replaced it meanwhile
+            journal = UploadJournal(journal.journal_id)
+            if journal.is_stale(ZIP_ORPHAN_UPLOAD_HOURS):
+                discard_journal(s3_client, journal)
+        finally:
+            case_lock.release()
 
-        # Create a temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_filename = (
-                f'case_{case_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
-            )
-            zip_path = os.path.join(temp_dir, zip_filename)
 
-            # List all objects in the bucket with the specific prefix
-            objects = s3_client.list_objects_v2(
-                Bucket=AWS_S3_BUCKET_NAME,
-                Prefix=f"documents/downloads/{case_id}/",
-            )
+def abort_orphaned_uploads(s3_client):
+    """
+    Aborts multipart uploads under documents/downloads/zips/ that no local journal
+    references and that are older than ZIP_ORPHAN_UPLOAD_HOURS.
+    """
+    active = active_upload_ids()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=ZIP_ORPHAN_UPLOAD_HOURS)
+    paginator = s3_client.get_paginator("list_multipart_uploads")
+    for page in paginator.paginate(
+        Bucket=AWS_S3_BUCKET_NAME, Prefix="documents/downloads/zips/"
+    ):
+        for upload in page.get("Uploads", []):
+            if upload["UploadId"] in active or upload["Initiated"] > cutoff:
+                continue
+            try:
+                s3_client.abort_multipart_upload(
+                    Bucket=AWS_S3_BUCKET_NAME,
+                    Key=upload["Key"],
+                    UploadId=upload["UploadId"],
+                )
+            except Exception as e:
+                print(f"Error aborting upload {upload['Key']}: {e}")
 
-            if "Contents" not in objects:
-                return None, f"No files found for case ID {case_id}"
 
-            # Filter files (ignore directories)
-            file_keys = [
-                obj["Key"]
-                for obj in objects["Contents"]
-                if not obj["Key"].endswith("/")
-            ]
-            total_files = len(file_keys)
+def run_janitor(s3_client):
+    """
+    Every ZIP_JANITOR_INTERVAL_MINUTES, discards stale journals and aborts orphaned uploads.
+    """
+    while True:
+        try:
+            discard_stale_journals(s3_client)
+            abort_orphaned_uploads(s3_client)
+        except Exception as e:
+            print(f"Error cleaning up uploads: {e}")
+        time.sleep(ZIP_JANITOR_INTERVAL_MINUTES * 60)
 
-            if total_files == 0:
-                return None, f"No valid files found for case ID {case_id}"
 
-            # Multi-threaded file download
-            downloaded_files = []
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [
-                    executor.submit(
-                        download_file, s3_client, AWS_S3_BUCKET_NAME, file_key, temp_dir
-                    )
-                    for file_key in file_keys
-                ]
+def start_janitor(s3_client):
+    """
+    Starts the janitor thread once per process.
+    """
+    global _janitor_started
+    with _janitor_lock:
+        if _janitor_started:
+            return
+        _janitor_started = True
+    threading.Thread(
+        target=run_janitor, args=(s3_client,), name="zip-janitor", daemon=True
+    ).start()
+
+
+def build_volume(s3_client, s3_engine, journal, index):
+    """
+    Downloads one volume's files, zips them, uploads the ZIP and returns its pre-signed URL.
+    Every step is checkpointed in the journal so a retry resumes where it stopped.
+    """
+    volume = journal.state["volumes"][index]
+    work_dir = os.path.join(journal.work_dir, volume["zip_filename"][: -len(".zip")])
+    os.makedirs(work_dir, exist_ok=True)
+    zip_path = os.path.join(work_dir, volume["zip_filename"])
 
-                for future in as_completed(futures):
-                    try:
-                        downloaded_files.append(future.result())
-                    except Exception as e:
-                        print(f"Error downloading file: {e}")
+    if not volume["uploaded"]:
+        if not volume["zip_built"]:
+            # Concurrent download of the members not staged yet. A member whose
+            # file is gone (e.g. its event survived a lost work dir) is fetched again
+            staged = {
+                key
+                for key in volume["members_staged"]
+                if os.path.exists(os.path.join(work_dir, os.path.basename(key)))
+            }
+            volume["members_staged"] = list(staged)
+
+            def on_file(file_key):
+                volume["members_staged"].append(file_key)
+                journal.record(index, {"staged": file_key})
+
+            s3_engine.download_files(
+                AWS_S3_BUCKET_NAME,
+                [key for key in volume["members"] if key not in staged],
+                work_dir,
+                on_file=on_file,
+            )
 
             # Create a ZIP file with downloaded files
+            staged = set(volume["members_staged"])
             with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                for file_path in downloaded_files:
-                    zipf.write(file_path, os.path.basename(file_path))
-                    os.remove(file_path)  # Clean up temporary file
-
-            # Upload the ZIP file to S3
-            zip_key = f"documents/downloads/zips/{case_id}/{zip_filename}"
-            s3_client.upload_file(zip_path, AWS_S3_BUCKET_NAME, zip_key)
-
-            # Generate pre-signed URL (valid for 1 hour)
-            presigned_url = s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": AWS_S3_BUCKET_NAME, "Key": zip_key},
-                ExpiresIn=3600,
-            )
+                for file_key in volume["members"]:
+                    if file_key in staged:
+                        zipf.write(
+                            os.path.join(work_dir, os.path.basename(file_key)),
+                            os.path.basename(file_key),
+                        )
+            volume["zip_built"] = True
+            journal.record(index, {"zip_built": True})
+
+            for file_key in staged:
+                os.remove(os.path.join(work_dir, os.path.basename(file_key)))
+
+        # Upload the ZIP file to S3, resuming from the last completed part
+        s3_engine.upload_file(
+            zip_path,
+            AWS_S3_BUCKET_NAME,
+            volume["zip_key"],
+            checkpoint=volume,
+            on_checkpoint=lambda event: journal.record(index, event),
+        )
+        volume["uploaded"] = True
+        journal.record(index, {"uploaded": True})
+        os.remove(zip_path)
+
+    # Generate pre-signed URL (valid for 1 hour)
+    return s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": AWS_S3_BUCKET_NAME, "Key": volume["zip_key"]},
+        ExpiresIn=3600,
+    )
+
+
+def list_case_files(s3_engine, case_id):
+    """
+    Lists the case files to archive, or returns an error if there are none.
+    """
+    # List all objects in the bucket with the specific prefix
+    objects = s3_engine.list_objects(
+        AWS_S3_BUCKET_NAME, f"documents/downloads/{case_id}/"
+    )
+
+    if not objects:
+        return None, f"No files found for case ID {case_id}"
+
+    # Filter files (ignore directories)
+    objects = [obj for obj in objects if not obj["Key"].endswith("/")]
+    total_files = len(objects)
+
+    if total_files == 0:
+        return None, f"No valid files found for case ID {case_id}"
+
+    return objects, None
+
+
+def snapshot_files(objects):
+    """
+    Maps each file key to its size and ETag, to tell whether the case files
+    changed since an archive was planned.
+    """
+    return {obj["Key"]: [obj["Size"], obj["ETag"]] for obj in objects}
+
+
+def plan_archive(case_id, objects):
+    """
+    Returns the journal state for a new archive of the listed case files.
+    """
+    zip_basename = f'case_{case_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+
+    volumes = plan_volumes(objects, ZIP_VOLUME_MAX_BYTES)
+    if len(volumes) == 1:
+        zip_filenames = [f"{zip_basename}.zip"]
+    else:
+        zip_filenames = [
+            f"{zip_basename}_part{index:02d}of{len(volumes):02d}.zip"
+            for index in range(1, len(volumes) + 1)
+        ]
+
+    return {
+        "case_id": case_id,
+        "zip_basename": zip_basename,
+        "files": snapshot_files(objects),
+        "volumes": [
+            {
+                "zip_filename": zip_filename,
+                "zip_key": f"documents/downloads/zips/{case_id}/{zip_filename}",
+                "members": members,
+                "members_staged": [],
+                "zip_built": False,
+                "upload_id": None,
+                "part_size": None,
+                "parts": [],
+                "uploaded": False,
+            }
+            for members, zip_filename in zip(volumes, zip_filenames)
+        ],
+    }
+
+
+def zip_s3_bucket_contents(case_id):
+    """
+    Zips all files in an S3 bucket folder documents/downloads/{case_id} and returns the pre-signed URLs for download.
+    With ZIP_VOLUME_MAX_BYTES set, the files are split into several size-capped ZIPs built and uploaded in parallel.
+    Progress is journaled under UPLOAD_JOURNAL_DIR, so a retry after a crash resumes the previous attempt
+    unless it is older than ZIP_ORPHAN_UPLOAD_HOURS or the case files changed since.
+    """
+    try:
+        s3_client = create_s3_client()
+        s3_engine = get_engine()
+        start_janitor(s3_client)
+
+        with get_case_lock(case_id):
+            objects, error = list_case_files(s3_engine, case_id)
+            if error:
+                return None, error
+
+            journal = UploadJournal(f"case_{case_id}")
+            if journal.state and (
+                # Its uploaded ZIPs may already be expired, or no longer match
+                # the case files: start over
+                journal.is_stale(ZIP_ORPHAN_UPLOAD_HOURS)
+                or journal.state.get("files") != snapshot_files(objects)
+            ):
+                discard_journal(s3_client, journal)
+            if not journal.state:
+                journal.create(plan_archive(case_id, objects))
+
+            # Build and upload the volumes in parallel
+            with ThreadPoolExecutor(max_workers=ZIP_VOLUME_WORKERS) as executor:
+                futures = [
+                    executor.submit(build_volume, s3_client, s3_engine, journal, index)
+                    for index in range(len(journal.state["volumes"]))
+                ]
+                presigned_urls = [future.result() for future in futures]
 
             # Create a lifecycle rule for the zip file to be deleted after 1 hour
             lifecycle_config = {
                 "Rules": [
                     {
-                        "ID": f"DeleteZipAfter1Hour_{zip_filename}",
+                        "ID": f"DeleteZipAfter1Hour_{journal.state['zip_basename']}",
                         "Filter": {"Prefix": f"documents/downloads/zips/{case_id}/"},
                         "Status": "Enabled",
                         "Expiration": {"Days": 1},
@@ -110,7 +344,8 @@ def zip_s3_bucket_contents(case_id):
             except Exception as e:
                 return None, str(e)
 
-            return presigned_url, None
+            journal.discard()
+            return presigned_urls, None
 
     except Exception as e:
         print(e)
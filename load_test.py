@@ -0,0 +1,253 @@
+"""
+Multi-session load test for the Streamlit app.
+
+Simulates N authenticated operators with Streamlit's AppTest. Each session
+saves its credentials and submits batches through upload_form.run, while the
+Lambda, S3 and SMTP backends are replaced by stubs with configurable latency.
+Reports rerun latency percentiles, thread counts, memory use and throughput
+for every concurrency level, e.g.:
+
+    python load_test.py --sessions 1,2,4,8 --batches 3 --codes 5
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# The stubs never reach AWS or SMTP, but upload_form reads these at import time
+for name in [
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_REGION",
+    "AWS_S3_BUCKET_NAME",
+    "AWS_LAMBDA_NAME",
+    "SMTP_SERVER",
+    "SMTP_PORT",
+    "SMTP_USERNAME",
+    "SMTP_PASSWORD",
+    "SENDER_EMAIL",
+    "LOGIN",
+    "PASSWORD",
+]:
+    os.environ.setdefault(name, "load-test")
+
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import (  # noqa: E402
+    MemoryCacheStorageManager,
+)
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import (  # noqa: E402
+    MemoryMediaFileStorage,
+)
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import upload_form  # noqa: E402
+
+
+def share_app_test_runtime():
+    """
+    AppTest installs and clears a mock Runtime singleton around every run, which
+    breaks when several sessions rerun at once. Pin one shared mock instead, as
+    a real server process has a single Runtime for all sessions.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+class BackendStubs:
+    """
+    Replaces the Lambda client, the S3 archive step and SMTP with sleeps.
+    """
+
+    def __init__(self, lambda_latency, s3_latency, smtp_latency):
+        self.lambda_latency = lambda_latency
+        self.s3_latency = s3_latency
+        self.smtp_latency = smtp_latency
+        self.cases = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, **kwargs):
+        time.sleep(self.lambda_latency)
+        return {"Payload": io.BytesIO(json.dumps({"statusCode": 200}).encode())}
+
+    def zip_s3_bucket_contents(self, case_id):
+        time.sleep(self.s3_latency)
+        return [f"https://example.invalid/{case_id}.zip"], None
+
+    def smtp(self, *args, **kwargs):
+        stubs = self
+
+        class SMTP:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def starttls(self):
+                pass
+
+            def login(self, username, password):
+                pass
+
+            def send_message(self, msg):
+                time.sleep(stubs.smtp_latency)
+                with stubs._lock:
+                    stubs.cases += 1
+
+        return SMTP()
+
+    def install(self):
+        upload_form.lambda_client.invoke = self.invoke
+        upload_form.zip_s3_bucket_contents = self.zip_s3_bucket_contents
+        upload_form.smtplib.SMTP = self.smtp
+
+
+def find_widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def run_session(session_id, args, rerun_times):
+    """
+    Drives one operator session: save credentials, then submit batches.
+    """
+
+    def timed_run(at):
+        started = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    at.session_state["authenticated"] = True
+    timed_run(at)
+
+    find_widget(at.text_input, "📧 Email").set_value(f"op{session_id}@example.com")
+    find_widget(at.text_input, "👤 Login").set_value(f"op{session_id}")
+    find_widget(at.text_input, "🔑 Senha").set_value("secret")
+    find_widget(at.button, "💾 Salvar Credenciais").click()
+    timed_run(at)
+
+    for batch in range(args.batches):
+        for i in range(5):
+            code = f"CIV{session_id:03d}{batch:03d}{i}" if i < args.codes else ""
+            at.text_input(key=f"process_code_{i}").set_value(code)
+        find_widget(at.button, "🚀 Processar").click()
+        timed_run(at)
+
+
+def current_rss_mb():
+    """
+    Current resident set size of this process, in MB. Falls back to the
+    lifetime peak (ru_maxrss) where /proc is not available, and to NaN where
+    neither is (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return float("nan")
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KiB elsewhere
+        return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_level(sessions, args, stubs):
+    """
+    Runs one concurrency level and returns its measurements.
+    """
+    rerun_times = []
+    cases_before = stubs.cases
+    rss_start = rss_peak = current_rss_mb()
+    peak_threads = threading.active_count()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        futures = [
+            executor.submit(run_session, session_id, args, rerun_times)
+            for session_id in range(sessions)
+        ]
+        while not all(future.done() for future in futures):
+            peak_threads = max(peak_threads, threading.active_count())
+            rss_peak = max(rss_peak, current_rss_mb())
+            time.sleep(0.01)
+        errors = [future.exception() for future in futures if future.exception()]
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "reruns": len(rerun_times),
+        "p50": percentile(rerun_times, 50),
+        "p95": percentile(rerun_times, 95),
+        "p99": percentile(rerun_times, 99),
+        "peak_threads": peak_threads,
+        "rss_start_mb": rss_start,
+        "rss_peak_mb": rss_peak,
+        "rss_end_mb": current_rss_mb(),
+        "cases_per_s": (stubs.cases - cases_before) / elapsed,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-session load test")
+    parser.add_argument("--sessions", default="1,2,4,8", help="concurrency levels")
+    parser.add_argument("--batches", type=int, default=3, help="batches per session")
+    parser.add_argument("--codes", type=int, default=5, help="codes per batch (1-5)")
+    parser.add_argument("--lambda-latency", type=float, default=0.5)
+    parser.add_argument("--s3-latency", type=float, default=0.2)
+    parser.add_argument("--smtp-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120, help="rerun timeout")
+    args = parser.parse_args()
+
+    stubs = BackendStubs(args.lambda_latency, args.s3_latency, args.smtp_latency)
+    stubs.install()
+    share_app_test_runtime()
+
+    print(
+        f"{'sessions':>8} {'reruns':>6} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+        f"{'threads':>7} {'RSS start/peak/end MB':>22} {'cases/s':>8} {'errors':>6}"
+    )
+    for sessions in [int(level) for level in args.sessions.split(",")]:
+        result = run_level(sessions, args, stubs)
+        rss = (
+            f"{result['rss_start_mb']:.1f}/{result['rss_peak_mb']:.1f}/"
+            f"{result['rss_end_mb']:.1f}"
+        )
+        print(
+            f"{result['sessions']:>8} {result['reruns']:>6} "
+            f"{result['p50']:>7.2f} {result['p95']:>7.2f} {result['p99']:>7.2f} "
+            f"{result['peak_threads']:>7} {rss:>22} "
+            f"{result['cases_per_s']:>8.2f} {result['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import cProfile
+import functools
+import glob
+import os
+import pstats
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from decouple import config
+
+# On Python 3.12+ only one cProfile can be active per interpreter: while a page
+# rerun is being profiled, the case jobs it starts are not profiled separately
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILE_DIR = config("PROFILE_DIR", default=".profiles")
+# Oldest profiles are deleted once the directory holds more than this
+PROFILE_MAX_FILES = config("PROFILE_MAX_FILES", default=500, cast=int)
+
+_rotate_lock = threading.Lock()
+
+
+def save_profile(profiler, label):
+    """
+    Writes a profile to PROFILE_DIR and removes the oldest ones beyond PROFILE_MAX_FILES.
+    Errors are logged and swallowed so profiling never fails the profiled code.
+    """
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = os.path.join(
+            PROFILE_DIR, f"{label}_{timestamp}_{threading.get_ident()}.prof"
+        )
+        # Dump next to the final path so readers never see a partial profile
+        profiler.dump_stats(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+        with _rotate_lock:
+            profiles = sorted(
+                glob.glob(os.path.join(PROFILE_DIR, "*.prof")), key=modified_time
+            )
+            for old_path in profiles[: max(0, len(profiles) - PROFILE_MAX_FILES)]:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+    except Exception as e:
+        print(f"Erro ao salvar perfil: {e}")
+
+
+def modified_time(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+@contextmanager
+def profile(label):
+    """
+    Profiles the enclosed block with cProfile when PROFILING_ENABLED is set.
+    If another profiler is already active (Python 3.12+), the block runs unprofiled.
+    """
+    profiler = cProfile.Profile() if PROFILING_ENABLED else None
+    if profiler:
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows a single active cProfile per interpreter
+            profiler = None
+
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            save_profile(profiler, label)
+
+
+def profiled(label):
+    """
+    Decorator version of profile().
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summarize_profiles(label=None, top=20):
+    """
+    Aggregates the saved profiles (optionally only one label) and returns the top
+    functions by cumulative time. Results are cached on the set of profile files.
+    """
+    pattern = f"{label}_*.prof" if label else "*.prof"
+    paths = tuple(sorted(glob.glob(os.path.join(PROFILE_DIR, pattern))))
+    return list(_summarize(paths, top))
+
+
+@functools.lru_cache(maxsize=8)
+def _summarize(paths, top):
+    # Files can be rotated away or still be written by job threads: skip those
+    stats, loaded = None, 0
+    for path in paths:
+        try:
+            if stats is None:
+                stats = pstats.Stats(path)
+            else:
+                stats.add(path)
+            loaded += 1
+        except (OSError, EOFError, ValueError, TypeError):
+            continue
+    if stats is None:
+        return ()
+
+    rows = [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "total_time": round(total_time, 4),
+            "cumulative_time": round(cumulative_time, 4),
+            "runs": loaded,
+        }
+        for (filename, line, name), (
+            _,
+            calls,
+            total_time,
+            cumulative_time,
+            _,
+        ) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row["cumulative_time"], reverse=True)
+    return tuple(rows[:top])
+
+
+if __name__ == "__main__":
+    for label in ["rerun", "job"]:
+        print(f"== {label} ==")
+        for row in summarize_profiles(label):
+            print(
+                f"{row['cumulative_time']:>10.3f}s {row['total_time']:>10.3f}s "
+                f"{row['calls']:>8} {row['function']}"
+            )
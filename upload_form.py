@@ -14,6 +14,7 @@ from botocore.config import Config
 from decouple import config
 
 from generate_pre_signed_url import zip_s3_bucket_contents
+from profiling import profiled, summarize_profiles
 
 # Page config for a cleaner look
 st.set_page_config(
@@ -102,22 +103,33 @@ def invoke_lambda(event_payload: dict) -> dict:
 
 
 def send_download_email(
-    recipient_email: str, process_code: str, download_url: str
+    recipient_email: str, process_code: str, download_urls: List[str]
 ) -> bool:
-    """Send email with pre-signed URL to the user."""
+    """Send email with the pre-signed URLs (one per ZIP volume) to the user."""
     try:
         msg = MIMEMultipart()
         msg["From"] = SENDER_EMAIL
         msg["To"] = recipient_email
         msg["Subject"] = f"Download Link para Processo {process_code}"
 
+        if len(download_urls) == 1:
+            links = (
+                f'Por favor, <a href="{download_urls[0]}" target="_blank">clique aqui</a> '
+                "para baixar os documentos."
+            )
+        else:
+            links = "Os documentos foram divididos em partes:<br>" + "<br>".join(
+                f'<a href="{url}" target="_blank">Parte {index} de {len(download_urls)}</a>'
+                for index, url in enumerate(download_urls, 1)
+            )
+
         # Use HTML body with hyperlink
         body = f"""
         <html>
         <body>
             <p>Olá,</p>
             <p>O seu processo <strong>{process_code}</strong> está pronto para download.<br>
-            Por favor, <a href="{download_url}" target="_blank">clique aqui</a> para baixar os documentos.</p>
+            {links}</p>
             <p>Este link expirará em 24 horas.</p>
             <p>Atenciosamente,<br>
             AutoBMG Processos</p>
@@ -140,6 +152,7 @@ def send_download_email(
         return False
 
 
+@profiled("job")
 def process_and_send_email(
     email: str, login: str, password: str, process_code: str
 ) -> Dict[str, any]:
@@ -157,12 +170,12 @@ def process_and_send_email(
         response = invoke_lambda(event_payload)
 
         if response["statusCode"] == 200:
-            # Generate download URL
-            download_url, error = zip_s3_bucket_contents(process_code)
+            # Generate download URLs
+            download_urls, error = zip_s3_bucket_contents(process_code)
 
-            if download_url:
+            if download_urls:
                 # Send email immediately
-                email_sent = send_download_email(email, process_code, download_url)
+                email_sent = send_download_email(email, process_code, download_urls)
 
                 return {
                     "code": process_code,
@@ -481,6 +494,38 @@ def run():
             )
 
 
+def render_profile_summary():
+    """Show the top hotspots across the saved profiles (PROFILING_ENABLED only)."""
+    with st.expander("🔬 Perfil de Execução"):
+        label = st.radio(
+            "Perfil",
+            ["rerun", "job"],
+            format_func=lambda label: {
+                "rerun": "Execuções da página",
+                "job": "Processos",
+            }[label],
+            horizontal=True,
+        )
+        if not st.button("🔍 Carregar Hotspots"):
+            return
+
+        hotspots = summarize_profiles(label)
+        if hotspots:
+            st.dataframe(
+                pd.DataFrame(hotspots),
+                column_config={
+                    "function": "Função",
+                    "calls": "Chamadas",
+                    "total_time": "Tempo Próprio (s)",
+                    "cumulative_time": "Tempo Acumulado (s)",
+                    "runs": "Perfis",
+                },
+                hide_index=True,
+            )
+        else:
+            st.info("Nenhum perfil coletado ainda.")
+
+
 def main():
     run()
 
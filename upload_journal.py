@@ -0,0 +1,145 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+from decouple import config
+
+UPLOAD_JOURNAL_DIR = config("UPLOAD_JOURNAL_DIR", default=".upload_journal")
+
+
+class UploadJournal:
+    """
+    Local checkpoint of one case's archive build. The plan (ZIP volumes and their
+    members) is written once to {journal_id}.json; progress (members staged on
+    disk, multipart upload IDs and completed parts, built/uploaded flags) is
+    appended to {journal_id}.log, so each checkpoint costs a single short write.
+    Files staged for the case live in work_dir next to the journal.
+    """
+
+    def __init__(self, journal_id):
+        self.journal_id = journal_id
+        self.path = os.path.join(UPLOAD_JOURNAL_DIR, f"{journal_id}.json")
+        self.log_path = os.path.join(UPLOAD_JOURNAL_DIR, f"{journal_id}.log")
+        self.work_dir = os.path.join(UPLOAD_JOURNAL_DIR, journal_id)
+        self._lock = threading.Lock()
+        self.state, self._log_end = load_journal(self.path, self.log_path)
+
+    def create(self, state):
+        """
+        Atomically writes the plan of a new archive and starts an empty log.
+        """
+        state["created_at"] = datetime.now().isoformat()
+        os.makedirs(UPLOAD_JOURNAL_DIR, exist_ok=True)
+        try:
+            os.remove(self.log_path)
+        except FileNotFoundError:
+            pass
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.path)
+        self.state, self._log_end = state, None
+
+    def record(self, volume_index, event):
+        """
+        Appends a progress event for one volume. The caller has already applied
+        it to the in-memory state; apply_event replays it on load. Before the
+        first append, a line left half written by a crash is cut off so new
+        events don't get glued onto it.
+        """
+        line = json.dumps({"volume": volume_index, **event})
+        with self._lock:
+            with open(self.log_path, "a") as f:
+                if self._log_end is not None:
+                    f.truncate(self._log_end)
+                    self._log_end = None
+                f.write(line + "\n")
+
+    def is_stale(self, max_age_hours):
+        created_at = self.state.get("created_at")
+        try:
+            age = datetime.now() - datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            return True
+        return age > timedelta(hours=max_age_hours)
+
+    def discard(self):
+        """
+        Removes the journal and its staged files.
+        """
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        for path in [self.path, self.log_path]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.state = {}
+
+
+def apply_event(volume, event):
+    """
+    Applies a logged progress event to a volume: "staged" and "part" add to
+    members_staged and parts, any other field is assigned.
+    """
+    for field, value in event.items():
+        if field == "staged":
+            volume["members_staged"].append(value)
+        elif field == "part":
+            volume["parts"].append(value)
+        else:
+            volume[field] = value
+
+
+def load_journal(path, log_path):
+    """
+    Loads the plan and replays the log over it. Returns the state and the length
+    of the log up to its last complete line (None if there is nothing to cut).
+    Malformed lines are skipped; an unreadable plan yields an empty state.
+    """
+    try:
+        with open(path) as f:
+            state = json.load(f)
+        volumes = state["volumes"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        return {}, None
+
+    try:
+        with open(log_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return state, None
+
+    # A crash can leave the last line half written
+    log_end = data.rfind(b"\n") + 1
+    for line in data[:log_end].splitlines():
+        try:
+            event = json.loads(line)
+            apply_event(volumes[event.pop("volume")], event)
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            continue
+    return state, log_end if log_end < len(data) else None
+
+
+def list_journals():
+    """
+    Returns every journal on disk.
+    """
+    return [
+        UploadJournal(os.path.basename(path)[: -len(".json")])
+        for path in glob.glob(os.path.join(UPLOAD_JOURNAL_DIR, "*.json"))
+    ]
+
+
+def active_upload_ids():
+    """
+    Returns the multipart upload IDs referenced by journals on disk.
+    """
+    upload_ids = set()
+    for journal in list_journals():
+        for volume in journal.state.get("volumes", []):
+            if volume.get("upload_id"):
+                upload_ids.add(volume["upload_id"])
+    return upload_ids